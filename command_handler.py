@@ -11,15 +11,22 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import logging
+import os
 import re
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Tuple
+from operator import itemgetter
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
+from github.Issue import Issue
 from github.IssueComment import IssueComment
+from github.NamedUser import NamedUser
 from github.PaginatedList import PaginatedList
 from github.Repository import Repository
-from jinja2 import Template
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 
 from config import Config
 from fcp_timers import FCPTimers
@@ -27,33 +34,121 @@ from storage import Storage
 
 log = logging.getLogger(__name__)
 
+# Status comments are identified by their body starting with this text
+STATUS_COMMENT_PREFIX = "Team member @"
+
+# Matches the username of each team member who has voted in a status comment
+TEAM_VOTE_REGEX = re.compile(r"^[*-] \[x\] @(.+)$", re.IGNORECASE | re.MULTILINE)
+
+# Matches the text of a resolved concern line in a status comment
+RESOLVED_CONCERN_REGEX = re.compile(r"^[*-] ~~(.+)~~.*")
+
+# Matches the line of a status comment that begins its list of concerns
+CONCERNS_HEADER_REGEX = re.compile(r"^concerns:", re.IGNORECASE | re.MULTILINE)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_template(path: str) -> Template:
+    """Load a jinja2 template from the given filepath.
+
+    The result is cached per path, so every CommandHandler shares a single compiled
+    template. Auto-reloading is disabled, so any changes to the template require
+    restarting the bot.
+
+    Comment templates produce markdown rather than HTML, so autoescaping is only
+    enabled for templates with an HTML file extension.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    env = Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=select_autoescape(enabled_extensions=("html", "htm")),
+        auto_reload=False,
+        cache_size=-1,
+    )
+    return env.get_template(filename)
+
 
 class CommandHandler(object):
     """Processes and handles issue comments that contain commands"""
 
+    __slots__ = (
+        "config",
+        "repo",
+        "COMMANDS",
+        "github_fcp_proposal_template",
+        "proposal",
+        "comment",
+        "comment_link",
+        "proposal_labels",
+        "_mention",
+        "command_regex",
+        "fcp_timers",
+        "_team_members",
+        "_team_member_logins",
+        "_team_members_fetched_at",
+        "_label_to_disposition",
+        "_lock",
+        "_status_comment",
+        "_status_comment_searched",
+    )
+
     def __init__(self, config: Config, store: Storage, repo: Repository):
         self.config = config
         self.repo = repo
+        # A map from command name (including aliases) to the function that handles it
         self.COMMANDS = {
-            self._command_fcp: ["fcp"],
-            self._command_review: ["review", "reviewed"],
-            self._command_concern: ["concern"],
-            self._command_resolve: ["resolve", "resolved"],
+            "fcp": self._command_fcp,
+            "review": self._command_review,
+            "reviewed": self._command_review,
+            "concern": self._command_concern,
+            "resolve": self._command_resolve,
+            "resolved": self._command_resolve,
         }
-        self.github_fcp_proposal_template = Template(
-            open(config.github_fcp_proposal_template_path).read(), autoescape=True
+        self.github_fcp_proposal_template = _load_template(
+            config.github_fcp_proposal_template_path
         )
         self.proposal = None
         self.comment = None
         self.comment_link = None
-        self.proposal_labels_str = []
-        self.team_vote_regex = re.compile(r"^[*|-] \[x\] @(.+)$", re.IGNORECASE)
-        self.resolved_concern_regex = re.compile(r"^[*|-] ~~(.+)~~.*")
+        self.proposal_labels = set()  # type: Set[str]
+
+        # The status comment of the current proposal, and whether it has been looked
+        # up yet. A proposal may not have a status comment at all
+        self._status_comment = None  # type: Optional[IssueComment]
+        self._status_comment_searched = False
+
+        # Commands are lines starting with a mention of the bot
+        self._mention = "@" + config.github_user.login
+        self.command_regex = re.compile(
+            rf"^[ \t]*{re.escape(self._mention)}[ \t]+(\S+)(.*)$",
+            re.MULTILINE,
+        )
+
+        self._team_members = []  # type: List[NamedUser]
+        self._team_member_logins = frozenset()  # type: FrozenSet[str]
+        self._team_members_fetched_at = None  # type: Optional[float]
+
+        # A map from disposition label to the disposition it represents
+        self._label_to_disposition = {
+            config.github_disposition_merge_label: "merge",
+            config.github_disposition_close_label: "close",
+            config.github_disposition_postpone_label: "postpone",
+        }
+
+        # Request-specific state (the proposal, its labels, the comment being
+        # processed) is stored on the handler. Webhooks are served from multiple
+        # threads and FCP timers fire on the scheduler's threads, so this lock ensures
+        # only one of them is processed at a time
+        self._lock = threading.Lock()
 
         # Set up FCP timer handler, and callback functions
         self.fcp_timers = FCPTimers(store, self._on_fcp_timer_fired)
 
     def handle_comment(self, comment: Dict) -> None:
+        with self._lock:
+            self._handle_comment(comment)
+
+    def _handle_comment(self, comment: Dict) -> None:
         # If this is a pull request review (not a comment or a comment in a review) then
         # the field containing comment text etc. will be "review" instead of "comment"
         if "comment" in comment:
@@ -73,12 +168,25 @@ class CommandHandler(object):
         # Check for any commands
         commands = self.parse_commands_from_text(comment_text)
 
+        # Edits are only relevant if they are made to a status comment, while new
+        # comments are only relevant if they contain a command. Check this before
+        # asking github for anything
+        if comment["action"] == "edited":
+            if not comment_text.startswith(STATUS_COMMENT_PREFIX):
+                log.debug("Ignoring edit of non-status comment")
+                return
+        elif not commands:
+            log.debug("Ignoring comment without any commands")
+            return
+
         # Retrieve the issue this comment is attached to
         # Account for issue and pull request review comments
         issue = comment["issue"] if "issue" in comment else comment["pull_request"]
-        self.proposal = self.repo.get_issue(issue["number"])
-        self.proposal_labels_str = [label["name"] for label in issue["labels"]]
-        original_labels = self.proposal_labels_str.copy()
+        self.proposal = self._issue_from_payload(issue)
+        original_labels = frozenset(label["name"] for label in issue["labels"])
+        self.proposal_labels = set(original_labels)
+        self._status_comment = None
+        self._status_comment_searched = False
 
         self.comment = comment
         self.comment_link = comment_fields["html_url"]
@@ -98,17 +206,30 @@ class CommandHandler(object):
             self._process_status_comment_update_with_body(comment_text)
         else:
             # Run command functions
-            for command in commands:
-                name, parameters = command
-                for command_function, command_names in self.COMMANDS.items():
-                    if name in command_names:
-                        # We found a matching function, run it with given parameters
-                        command_function(parameters)
-
-        # Check if the proposal labels have changed during processing
-        if self.proposal_labels_str != original_labels:
-            # If so, update them on the server
-            self.proposal.set_labels(*self.proposal_labels_str)
+            for name, parameters in commands:
+                command_function = self.COMMANDS.get(name)
+                if command_function:
+                    # We found a matching function, run it with given parameters
+                    command_function(parameters)
+
+        # Update the proposal labels on the server if they've changed during processing
+        self._update_proposal_labels(original_labels)
+
+    def _issue_from_payload(self, issue: Dict) -> Issue:
+        """Build an Issue object from the issue or pull request contained in a webhook
+        payload, rather than fetching the issue again from github.
+
+        Any attributes that are missing from the payload will be lazily fetched by
+        PyGithub when accessed.
+        """
+        attributes = dict(issue)
+
+        # Pull request payloads point at the pulls API. Comment, label and state
+        # operations go through the issues API instead
+        if "issue_url" in attributes:
+            attributes["url"] = attributes["issue_url"]
+
+        return Issue(self.repo._requester, {}, attributes, completed=False)
 
     def parse_commands_from_text(self, text: str) -> List[Tuple[str, List[str]]]:
         """Extract any bot commands from a comment
@@ -116,27 +237,23 @@ class CommandHandler(object):
         Returns:
             A list of tuples containing (command name, list of command parameters)
         """
-        commands = []
-        lines = text.split("\n")
-
-        # Read each line of the comment and check if it starts with @<botname>
-        for line in lines:
-            words = line.split()
-            if not words:
-                # Account for empty lines
-                continue
-
-            first_word = words.pop(0)
-            if first_word == "@" + self.config.github_user.login:
-                command = words[0]
-                parameters = words[1:]
-                commands.append((command, parameters))
+        # Most comments don't mention the bot at all
+        if self._mention not in text:
+            return []
 
-        return commands
+        # Find each line of the comment that starts with @<botname> <command>
+        return [
+            (match.group(1), match.group(2).split())
+            for match in self.command_regex.finditer(text)
+        ]
 
     def _command_fcp(self, parameters: List[str]):
         """Kick off an FCP with a given disposition"""
-        disposition = parameters.pop(0)
+        if not parameters:
+            self._post_comment("Please specify a disposition for the FCP.")
+            return
+
+        disposition = parameters[0]
 
         if disposition == "cancel":
             self._cancel_fcp()
@@ -146,7 +263,7 @@ class CommandHandler(object):
             self._post_comment(f"Unknown disposition '{disposition}'.")
             return
 
-        if self.config.github_fcp_proposed_label in self.proposal_labels_str:
+        if self.config.github_fcp_proposed_label in self.proposal_labels:
             self._post_comment("An FCP proposal is already in progress.")
             return
 
@@ -156,7 +273,7 @@ class CommandHandler(object):
     def _command_review(self, parameters: List[str]):
         """Mark an in-FCP proposal as reviewed by the commenter"""
         # Ensure that this proposal is in FCP proposed state
-        if self.config.github_fcp_proposed_label not in self.proposal_labels_str:
+        if self.config.github_fcp_proposed_label not in self.proposal_labels:
             self._post_comment(
                 "This proposal has not had an FCP proposed, so you cannot review it."
             )
@@ -224,10 +341,9 @@ class CommandHandler(object):
         concerns = self._parse_concerns_from_status_comment_body(status_comment.body)
 
         # Check that this concern hasn't already been raised
-        for text, resolved in concerns:
-            if concern_text == text:
-                self._post_comment("That concern has already been raised.")
-                return
+        if any(concern_text == text for text, _ in concerns):
+            self._post_comment("That concern has already been raised.")
+            return
 
         # Add this concern as unresolved
         concerns.append((concern_text, False))
@@ -238,10 +354,7 @@ class CommandHandler(object):
         )
 
         # Add the concern label if it doesn't already exist
-        if self.config.github_unresolved_concerns_label not in self.proposal_labels_str:
-            self.proposal_labels_str.append(
-                self.config.github_unresolved_concerns_label
-            )
+        self.proposal_labels.add(self.config.github_unresolved_concerns_label)
 
     def _resolve_concern_on_status_comment(
         self,
@@ -253,11 +366,10 @@ class CommandHandler(object):
         concerns = self._parse_concerns_from_status_comment_body(status_comment.body)
 
         # Check that this concern exists
-        concern_index = -1
-        for index, concern in enumerate(concerns):
-            text, resolved = concern
-            if concern_text == text:
-                concern_index = index
+        concern_index = next(
+            (index for index, (text, _) in enumerate(concerns) if concern_text == text),
+            -1,
+        )
 
         if concern_index == -1:
             # We didn't find the concern
@@ -276,20 +388,17 @@ class CommandHandler(object):
         # Check if all concerns have been resolved
         if all(resolved for _, resolved in concerns):
             # Remove the unresolved_concerns label
-            if self.config.github_unresolved_concerns_label in self.proposal_labels_str:
-                self.proposal_labels_str.remove(
-                    self.config.github_unresolved_concerns_label
-                )
+            self.proposal_labels.discard(self.config.github_unresolved_concerns_label)
 
     def _fcp_proposal_with_disposition(self, disposition: str):
         """Propose an FCP with a given disposition"""
         # Ensure this proposal is not already in FCP
-        if self.config.github_fcp_label in self.proposal_labels_str:
+        if self.config.github_fcp_label in self.proposal_labels:
             self._post_comment("This proposal is already in FCP.")
             return
 
         # Ensure this proposal is not already in FCP-proposed
-        if self.config.github_fcp_proposed_label in self.proposal_labels_str:
+        if self.config.github_fcp_proposed_label in self.proposal_labels:
             self._post_comment(
                 "This proposal has already had a FCP proposed. Please "
                 "cancel the current one first."
@@ -305,26 +414,20 @@ class CommandHandler(object):
 
         # Add the relevant disposition label
         if disposition == "merge":
-            self.proposal_labels_str.append(self.config.github_disposition_merge_label)
+            self.proposal_labels.add(self.config.github_disposition_merge_label)
         elif disposition == "postpone":
-            self.proposal_labels_str.append(
-                self.config.github_disposition_postpone_label
-            )
+            self.proposal_labels.add(self.config.github_disposition_postpone_label)
         elif disposition == "close":
-            self.proposal_labels_str.append(self.config.github_disposition_close_label)
+            self.proposal_labels.add(self.config.github_disposition_close_label)
 
         # Add the proposal label
-        self.proposal_labels_str.append(self.config.github_fcp_proposed_label)
+        self.proposal_labels.add(self.config.github_fcp_proposed_label)
 
         # Remove proposal in review label if present
-        if self.config.github_fcp_proposal_in_review_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(
-                self.config.github_fcp_proposal_in_review_label
-            )
+        self.proposal_labels.discard(self.config.github_fcp_proposal_in_review_label)
 
         # Remove finished FCP label if present
-        if self.config.github_fcp_finished_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(self.config.github_fcp_finished_label)
+        self.proposal_labels.discard(self.config.github_fcp_finished_label)
 
     def _process_status_comment_update_with_body(self, status_comment_body: str):
         """Process an edit on a status comment. Checks to see if the required
@@ -335,7 +438,7 @@ class CommandHandler(object):
         num_team_votes = len(
             self._parse_team_votes_from_status_comment_body(status_comment_body)
         )
-        num_team_members = self.config.github_team.get_members().totalCount
+        num_team_members = len(self._get_team_members())
 
         # Check if more than 75% of people have voted
         team_vote_ratio = num_team_votes / num_team_members
@@ -355,7 +458,7 @@ class CommandHandler(object):
             return
 
         # Check that this proposal isn't already in FCP
-        if self.config.github_fcp_label in self.proposal_labels_str:
+        if self.config.github_fcp_label in self.proposal_labels:
             log.warning("FCP attempted to start on a proposal that was already in FCP")
             return
 
@@ -390,36 +493,38 @@ class CommandHandler(object):
         self._post_comment(comment_text)
 
         # Add the FCP label
-        self.proposal_labels_str.append(self.config.github_fcp_label)
+        self.proposal_labels.add(self.config.github_fcp_label)
 
         # Remove the FCP proposal label if present
-        if self.config.github_fcp_proposed_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(self.config.github_fcp_proposed_label)
+        self.proposal_labels.discard(self.config.github_fcp_proposed_label)
 
         # Remove the proposal in review label if present
-        if self.config.github_fcp_proposal_in_review_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(
-                self.config.github_fcp_proposal_in_review_label
-            )
+        self.proposal_labels.discard(self.config.github_fcp_proposal_in_review_label)
 
     def _get_status_comment(self) -> Optional[IssueComment]:
-        """Retrieves an existing status comment for a proposal
+        """Retrieves an existing status comment for a proposal. The result is cached
+        until the next comment or FCP timer is processed.
 
         Returns:
             The status comment, or None if it cannot be found.
         """
+        if self._status_comment_searched:
+            return self._status_comment
+
         # Retrieve all of the comments for the proposal
         comments: PaginatedList = self.proposal.get_comments()
 
         # Find the latest status comment
         for comment in comments.reversed:
             if (
-                comment.body.startswith("Team member @")
+                comment.body.startswith(STATUS_COMMENT_PREFIX)
                 and comment.user.login == self.config.github_user.login
             ):
-                return comment
+                self._status_comment = comment
+                break
 
-        return None
+        self._status_comment_searched = True
+        return self._status_comment
 
     def _parse_team_votes_from_status_comment_body(
         self, comment_body: str
@@ -430,14 +535,7 @@ class CommandHandler(object):
         Returns:
             A list of github usernames which have voted
         """
-        voted_members = []
-        for line in comment_body.split("\n"):
-            match = self.team_vote_regex.match(line)
-            if match:
-                member = match.group(1)
-                voted_members.append(member)
-
-        return voted_members
+        return TEAM_VOTE_REGEX.findall(comment_body)
 
     def _parse_concerns_from_status_comment_body(
         self, comment_body: str
@@ -449,49 +547,73 @@ class CommandHandler(object):
 
         # We search for a list of concerns in the comment body, however
         # tagged members is also a list. We know the list of concerns will
-        # come after a line starting with "concerns:", so ignore all list
-        # items before that
-        past_tagged_people_list = False
-        for line in comment_body.split("\n"):
-            # Check if we've passed the Concerns: bit of a status comment yet
-            if line.lower().startswith("concerns:"):
-                past_tagged_people_list = True
-            if not past_tagged_people_list:
+        # come after a line starting with "concerns:", so skip straight past
+        # that line and only look at what follows it
+        header_match = CONCERNS_HEADER_REGEX.search(comment_body)
+        if not header_match:
+            return concern_tuples
+
+        concern_lines = comment_body[header_match.start() :].splitlines()[1:]
+        for line in concern_lines:
+            # Check if this is a concern line
+            if line[:2] not in ("* ", "- "):
                 continue
 
-            # Check if this is a concern line
-            if line.startswith("* ") or line.startswith("- "):
-                # Check if this concern is resolved or not
-                if line.startswith("* ~~") or line.startswith("- ~~"):
-                    # Extract concern text from resolved concern
-                    match = self.resolved_concern_regex.match(line)
-                    if not match:
-                        log.error(
-                            "Unable to match a resolved concern ('%s') with our regex",
-                            line,
-                        )
-                        continue
-
-                    # Get the concern text from the regex match
-                    concern_text = match.group(1)
-                    concern_tuples.append((concern_text, True))
-                else:
-                    # Extract concern text from non-resolved concern
-                    concern_tuples.append((line[2:], False))
+            # Check if this concern is resolved or not
+            if line[2:4] == "~~":
+                # Extract concern text from resolved concern
+                match = RESOLVED_CONCERN_REGEX.match(line)
+                if not match:
+                    log.error(
+                        "Unable to match a resolved concern ('%s') with our regex",
+                        line,
+                    )
+                    continue
+
+                # Get the concern text from the regex match
+                concern_text = match.group(1)
+                concern_tuples.append((concern_text, True))
+            else:
+                # Extract concern text from non-resolved concern
+                concern_tuples.append((line[2:], False))
 
         return concern_tuples
 
+    def _get_team_members(self) -> List[NamedUser]:
+        """Retrieve the members of the proposal team.
+
+        Team membership rarely changes, so the list is cached for the configured
+        number of seconds to avoid paginating through the team on github every time
+        it is needed.
+        """
+        now = time.monotonic()
+        if (
+            self._team_members_fetched_at is None
+            or now - self._team_members_fetched_at > self.config.github_team_cache_ttl
+        ):
+            self._team_members = list(self.config.github_team.get_members())
+            self._team_member_logins = frozenset(
+                member.login for member in self._team_members
+            )
+            self._team_members_fetched_at = now
+
+        return self._team_members
+
+    def is_team_member(self, login: str) -> bool:
+        """Return whether the given user is a member of the proposal team"""
+        self._get_team_members()
+        return login in self._team_member_logins
+
     def _format_team_votes(self, voted_members: List[str]) -> str:
         """Given a list of members who have already voted, return a str list of
         who has an hasn't voted"""
-        vote_text = ""
-        for team_member in self.config.github_team.get_members():
-            if team_member.login in voted_members:
-                vote_text += "- [x] @" + team_member.login + "\n"
-            else:
-                vote_text += "- [ ] @" + team_member.login + "\n"
+        voted = set(voted_members)
+        lines = [
+            f"- [{'x' if team_member.login in voted else ' '}] @{team_member.login}\n"
+            for team_member in self._get_team_members()
+        ]
 
-        return vote_text
+        return "".join(lines)
 
     def _format_concerns(self, concerns: List[Tuple[str, bool]]) -> str:
         """Take a list of concern tuples and return a markdown-formatted list.
@@ -505,26 +627,21 @@ class CommandHandler(object):
         if not concerns:
             return ""
 
-        # Sort by resolved status
-        concerns.sort(key=lambda x: x[1], reverse=True)
+        # Sort by resolved status, without modifying the caller's list
+        lines = [
+            f"* ~~{concern}~~\n" if resolved else f"* {concern}\n"
+            for concern, resolved in sorted(concerns, key=itemgetter(1), reverse=True)
+        ]
 
-        text = "Concerns:\n\n"
-        for concern, resolved in concerns:
-            if resolved:
-                text += f"* ~~{concern}~~\n"
-            else:
-                text += f"* {concern}\n"
-
-        return text
+        return "Concerns:\n\n" + "".join(lines)
 
     def _cancel_fcp(self):
         """Cancel FCP"""
-        if self.config.github_fcp_proposed_label in self.proposal_labels_str:
+        if self.config.github_fcp_proposed_label in self.proposal_labels:
             log.debug("Cancelling FCP proposal...")
 
             # Remove the FCP proposed label if present
-            if self.config.github_fcp_proposed_label in self.proposal_labels_str:
-                self.proposal_labels_str.remove(self.config.github_fcp_proposed_label)
+            self.proposal_labels.discard(self.config.github_fcp_proposed_label)
 
             # Place a note on the current status comment declaring FCP proposal has been
             # cancelled
@@ -544,12 +661,11 @@ class CommandHandler(object):
                 text_to_prepend=prepend_text,
             )
 
-        elif self.config.github_fcp_label in self.proposal_labels_str:
+        elif self.config.github_fcp_label in self.proposal_labels:
             log.debug("Cancelling FCP...")
 
             # Remove the FCP label if present
-            if self.config.github_fcp_label in self.proposal_labels_str:
-                self.proposal_labels_str.remove(self.config.github_fcp_label)
+            self.proposal_labels.discard(self.config.github_fcp_label)
 
             # Remove the FCP timer
             self.fcp_timers.cancel_timer_for_proposal_num(self.proposal.number)
@@ -562,17 +678,12 @@ class CommandHandler(object):
             self._post_comment("This proposal is not in FCP nor has had FCP proposed.")
 
         # Remove any disposition labels if present
-        if self.config.github_disposition_close_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(self.config.github_disposition_close_label)
-        if self.config.github_disposition_merge_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(self.config.github_disposition_merge_label)
-        if self.config.github_disposition_postpone_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(
-                self.config.github_disposition_postpone_label
-            )
+        self.proposal_labels.discard(self.config.github_disposition_close_label)
+        self.proposal_labels.discard(self.config.github_disposition_merge_label)
+        self.proposal_labels.discard(self.config.github_disposition_postpone_label)
 
         # Add the proposal in review label back again
-        self.proposal_labels_str.append(self.config.github_fcp_proposal_in_review_label)
+        self.proposal_labels.add(self.config.github_fcp_proposal_in_review_label)
 
     def _post_or_update_status_comment(
         self,
@@ -643,9 +754,42 @@ class CommandHandler(object):
         log.debug("Posting/updating status comment: %s", comment_text)
 
         if existing_status_comment:
-            existing_status_comment.edit(comment_text)
+            # Avoid a request to github if the edit wouldn't change anything
+            if existing_status_comment.body.replace("\r\n", "\n") == comment_text:
+                log.debug("Status comment is unchanged, not editing it")
+            else:
+                existing_status_comment.edit(comment_text)
+        else:
+            self._status_comment = self._post_comment(comment_text)
+            self._status_comment_searched = True
+
+        if text_to_prepend:
+            # This comment is no longer detectable as a status comment, so search
+            # again the next time one is needed
+            self._status_comment = None
+            self._status_comment_searched = False
+
+    def _update_proposal_labels(self, original_labels: FrozenSet[str]):
+        """Send any changes to the proposal's labels to github, with a single request
+
+        Args:
+            original_labels: The labels the proposal had before processing began
+        """
+        added_labels = self.proposal_labels - original_labels
+        removed_labels = original_labels - self.proposal_labels
+
+        if not added_labels and not removed_labels:
+            return
+
+        if not removed_labels:
+            # Any number of labels can be added in one request
+            self.proposal.add_to_labels(*sorted(added_labels))
+        elif not added_labels and len(removed_labels) == 1:
+            # Labels can only be removed one request at a time
+            self.proposal.remove_from_labels(*removed_labels)
         else:
-            self._post_comment(comment_text)
+            # Otherwise replace the proposal's labels entirely
+            self.proposal.set_labels(*sorted(self.proposal_labels))
 
     def _post_comment(self, text: str) -> Optional[IssueComment]:
         """Post a comment with the given text to a proposal
@@ -664,15 +808,20 @@ class CommandHandler(object):
     def _on_fcp_timer_fired(self, proposal_num: int):
         log.info("FCP for proposal %d has concluded", proposal_num)
 
-        # Retrieve the proposal object of this proposal
-        self.proposal = self.repo.get_issue(proposal_num)
-        self.proposal_labels_str = [label.name for label in self.proposal.get_labels()]
+        with self._lock:
+            # Retrieve the proposal object of this proposal
+            self.proposal = self.repo.get_issue(proposal_num)
+            # The fetched issue already carries its labels
+            original_labels = frozenset(label.name for label in self.proposal.labels)
+            self.proposal_labels = set(original_labels)
+            self._status_comment = None
+            self._status_comment_searched = False
 
-        # Enact the disposition specified by the proposal labels
-        self._enact_disposition()
+            # Enact the disposition specified by the proposal labels
+            self._enact_disposition()
 
-        # Update labels
-        self.proposal.set_labels(*self.proposal_labels_str)
+            # Update labels if they have changed
+            self._update_proposal_labels(original_labels)
 
     def _get_disposition(self) -> Optional[str]:
         """Get the current proposal disposition
@@ -680,70 +829,75 @@ class CommandHandler(object):
         Returns:
             The disposition type, or None if no known disposition
         """
-        for label in self.proposal_labels_str:
-            if label == self.config.github_disposition_merge_label:
-                return "merge"
-            elif label == self.config.github_disposition_close_label:
-                return "close"
-            elif label == self.config.github_disposition_postpone_label:
-                return "postpone"
+        disposition_label = self._get_disposition_label()
+        if not disposition_label:
+            return None
+
+        return self._label_to_disposition[disposition_label]
+
+    def _get_disposition_label(self) -> Optional[str]:
+        """Get the disposition label currently on the proposal. If there are several,
+        the first in merge, close, postpone order is picked so the choice doesn't
+        depend on set iteration order
+
+        Returns:
+            The disposition label, or None if the proposal has none
+        """
+        disposition_labels = [
+            label
+            for label in self._label_to_disposition
+            if label in self.proposal_labels
+        ]
+        if not disposition_labels:
+            return None
+
+        if len(disposition_labels) > 1:
+            log.warning(
+                "Proposal #%d has multiple disposition labels %s, using '%s'",
+                self.proposal.number,
+                disposition_labels,
+                disposition_labels[0],
+            )
 
-        return None
+        return disposition_labels[0]
 
     def _enact_disposition(self):
         """Enact a disposition on a proposal, defined by the current disposition label
         of the proposal
         """
-        # Figure out which disposition to enact
-        disposition = self._get_disposition()
-        if not disposition:
+        # Figure out which disposition to enact. This is the same disposition the
+        # status comment shows
+        disposition_label = self._get_disposition_label()
+        if not disposition_label:
             log.error(
                 f"Attempted to enact a disposition on a proposal without a valid "
-                f"disposition label. Proposal labels: {self.proposal_labels_str}"
+                f"disposition label. Proposal labels: {self.proposal_labels}"
             )
             return
 
         # Link to the status comment
         status_comment = self._get_status_comment()
 
-        # TODO: Convert to enum
-        if disposition == "merge":
-            self._merge_proposal(status_comment.html_url)
-            disposition_label = self.config.github_disposition_merge_label
-        elif disposition == "close":
-            self._close_proposal(status_comment.html_url)
-            disposition_label = self.config.github_disposition_close_label
-        else:
-            self._postpone_proposal(status_comment.html_url)
-            disposition_label = self.config.github_disposition_postpone_label
+        self._conclude_fcp(
+            self._label_to_disposition[disposition_label], status_comment.html_url
+        )
 
         # Remove the FCP label if present
-        if self.config.github_fcp_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(self.config.github_fcp_label)
+        self.proposal_labels.discard(self.config.github_fcp_label)
 
         # Add the "finished FCP" label
-        self.proposal_labels_str.append(self.config.github_fcp_finished_label)
+        self.proposal_labels.add(self.config.github_fcp_finished_label)
 
         # Remove the disposition label
-        if disposition_label and disposition_label in self.proposal_labels_str:
-            self.proposal_labels_str.remove(disposition_label)
+        self.proposal_labels.discard(disposition_label)
 
-    def _merge_proposal(self, status_comment_url: str):
-        # TODO: Merge the proposal. Has to be done with git
+    def _conclude_fcp(self, disposition: str, status_comment_url: str):
+        """Announce that an FCP has completed, and carry out the given disposition"""
         self._post_comment(
-            f"The final comment period, with a disposition to **merge**, as per "
-            f"[the review]({status_comment_url}) above, is now **complete**."
+            f"The final comment period, with a disposition to **{disposition}**, as "
+            f"per [the review]({status_comment_url}) above, is now **complete**."
         )
 
-    def _close_proposal(self, status_comment_url: str):
-        self._post_comment(
-            "The final comment period, with a disposition to **close**, as per "
-            f"[the review]({status_comment_url}) above, is now **complete**."
-        )
-        self.proposal.edit(state="closed")
-
-    def _postpone_proposal(self, status_comment_url: str):
-        self._post_comment(
-            "The final comment period, with a disposition to **postpone**, as per "
-            f"[the review]({status_comment_url}) above, is now **complete**."
-        )
+        # TODO: Merge the proposal on a disposition to merge. Has to be done with git
+        if disposition == "close":
+            self.proposal.edit(state="closed")
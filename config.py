@@ -41,7 +41,9 @@ class Config(object):
 
         # Load in the config file at the given filepath
         with open(filepath) as file_stream:
-            self.config = yaml.safe_load(file_stream)
+            # Prefer libyaml's C loader when PyYAML was built with it
+            loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+            self.config = yaml.load(file_stream, Loader=loader)
 
         # Logging setup
         formatter = logging.Formatter(
@@ -124,6 +126,9 @@ class Config(object):
 
         self.github_org_name = self._get_config_item(["github", "org"])
         self.github_team_name = self._get_config_item(["github", "team"])
+        self.github_team_cache_ttl = self._get_config_item(
+            ["github", "team_cache_ttl"], default=300, required=False
+        )
 
         # FCP information
         self.fcp_time_days = self._get_config_item(["fcp", "time_days"], required=False)
@@ -150,24 +155,23 @@ class Config(object):
             ConfigError: If required is specified and the object is not found
                 (and there is no default value provided), this error will be raised
         """
-        option_name = path.pop(-1)
-
-        path_str = ".".join(path)
+        # Split off the option name without modifying the caller's list
+        *parents, option_name = path
 
         # Sift through the config dicts specified by `path` to get the one containing
         # our option
         config_dict = self.config
-        for name in path:
+        for name in parents:
             config_dict = config_dict.get(name)
             if not config_dict:
                 if required and not default:
-                    raise ConfigError(f"Config option {path_str} is required")
+                    raise ConfigError(f"Config option {'.'.join(parents)} is required")
                 else:
                     config_dict = {}
 
         # Retrieve the option
         option = config_dict.get(option_name, default)
         if required and not option:
-            raise ConfigError(f"Config option {path_str+'.'+option_name} is required")
+            raise ConfigError(f"Config option {'.'.join(path)} is required")
 
         return option
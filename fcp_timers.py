@@ -15,6 +15,7 @@ import logging
 from datetime import datetime
 
 from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.date import DateTrigger
 
@@ -40,7 +41,10 @@ class FCPTimers(object):
         # This will fire events when FCPs complete
         # When an event is scheduled, a Job is returned
         self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+
+        # Start paused, so adding the saved timers doesn't wake the scheduler's
+        # thread once per timer
+        self.scheduler.start(paused=True)
 
         # Create a dict from proposal number to scheduler Job
         self.timers = {}
@@ -48,11 +52,17 @@ class FCPTimers(object):
         # Load timer information
         self._db_load_timers()
 
+        self.scheduler.resume()
+
     def new_timer(self, run_time: datetime, proposal_num: int, save=True):
         """Start a new timer. Saves the timer to the db if `save` is True"""
         # Schedule a new job
+        # Timers that came due while we were offline still fire once we're back
         job = self.scheduler.add_job(
-            self._run_callback, DateTrigger(run_time), args=[proposal_num]
+            self._run_callback,
+            DateTrigger(run_time),
+            args=[proposal_num],
+            misfire_grace_time=None,
         )
 
         # Record the timer's job ID along with the proposal number
@@ -68,56 +78,57 @@ class FCPTimers(object):
         if proposal_num not in self.timers:
             raise ProposalNotInFCP("This proposal does not have an FCP timer")
 
-        # Cancel this job if hasn't already been
-        job = self.timers[proposal_num]  # type: Job
-        if self.scheduler.get_job(job.id):
-            job.remove()
+        # Stop tracking the timer before anything below has a chance to fail
+        job = self.timers.pop(proposal_num)  # type: Job
 
-        self.timers.pop(proposal_num)
+        # Cancel this job if hasn't already been
+        try:
+            self.scheduler.remove_job(job.id)
+        except JobLookupError:
+            # The scheduler already removed this job after it ran
+            pass
 
         # Remove it from the db
         self._db_delete_timer(proposal_num)
 
     def _db_load_timers(self):
         """Load all known FCP timers from the DB into self.timers"""
-        with self.store.conn:
-            self.store.cur.execute("SELECT * FROM fcp_timers")
-            rows = self.store.cur.fetchall()
+        with self.store.cursor() as cur:
+            # Have postgres convert the stored unix timestamps into datetimes, and
+            # return the timers in the order they will fire
+            cur.execute(
+                """
+            SELECT proposal_num, to_timestamp(end_timestamp)
+            FROM fcp_timers
+            ORDER BY end_timestamp
+            """
+            )
+            rows = cur.fetchall()
             if not rows:
                 return
 
-            for row in rows:
-                proposal_num = row[0]
-                timestamp = row[1]
-
-                run_time = datetime.fromtimestamp(timestamp)
+            for proposal_num, run_time in rows:
                 self.new_timer(run_time, proposal_num, save=False)
 
     def _db_save_timer(self, timestamp: datetime, proposal_num: int):
         """Saves a timer to the database"""
-        with self.store.conn:
-            self.store.cur.execute(
+        with self.store.cursor() as cur:
+            cur.execute(
                 """
             INSERT INTO fcp_timers (proposal_num, end_timestamp)
                 VALUES (%s, %s)
             ON CONFLICT (proposal_num)
             DO UPDATE
-                SET end_timestamp = %s
-                WHERE fcp_timers.proposal_num = %s
+                SET end_timestamp = EXCLUDED.end_timestamp
             """,
-                (
-                    proposal_num,
-                    timestamp.timestamp(),
-                    proposal_num,
-                    timestamp.timestamp(),
-                ),
+                (proposal_num, timestamp.timestamp()),
             )
 
     def _db_delete_timer(self, proposal_num: int):
         """Deletes a timer from the database"""
-        with self.store.conn:
+        with self.store.cursor() as cur:
             log.info("DELETING %s", proposal_num)
-            self.store.cur.execute(
+            cur.execute(
                 "DELETE FROM fcp_timers WHERE proposal_num = %s", (proposal_num,)
             )
 
@@ -16,7 +16,7 @@
 import argparse
 import logging
 
-from github import Github
+from github import Auth, Github
 from github.GithubException import UnknownObjectException
 
 from config import Config
@@ -40,8 +40,10 @@ def main():
     # Set up the database
     store = Storage(config.database_path)
 
-    # Log into github with provided access token
-    github = Github(config.github_access_token)
+    # Log into github with provided access token. Request the maximum page size so
+    # that walking long comment threads takes as few requests as possible. PyGithub's
+    # default retry policy already retries server errors and waits out rate limits
+    github = Github(auth=Auth.Token(config.github_access_token), per_page=100)
     if not github:
         log.fatal("Unable to connect to github")
         return
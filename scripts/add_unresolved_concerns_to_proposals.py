@@ -15,6 +15,9 @@ from progress.bar import Bar
 
 log = logging.getLogger(__name__)
 
+# Matches a resolved concern line in a status comment, capturing the concern text
+RESOLVED_CONCERN_REGEX = re.compile(r"^[*-] ~~(.+)~~.*")
+
 
 def _get_status_comment(
     github_user: AuthenticatedUser, proposal: Issue
@@ -59,11 +62,11 @@ def _parse_concerns_from_status_comment_body(
             continue
 
         # Check if this is a concern line
-        if line.startswith("* ") or line.startswith("- "):
+        if line.startswith(("* ", "- ")):
             # Check if this concern is resolved or not
-            if line.startswith("* ~~") or line.startswith("- ~~"):
+            if line.startswith(("* ~~", "- ~~")):
                 # Extract concern text from resolved concern
-                match = re.match(r"^[*|-] ~~(.+)~~.*", line)
+                match = RESOLVED_CONCERN_REGEX.match(line)
                 if not match:
                     log.error(
                         "Unable to match a resolved concern ('%s') with our regex",
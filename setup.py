@@ -22,7 +22,7 @@ setup(
     py_modules=["mscbot"],
     description="A bot to help manage the MSC process",
     install_requires=[
-        "PyGithub>=1.45",
+        "PyGithub>=2.0",
         "PyYAML>=5.3",
         "github-webhook>=1.0.3",
         "waitress>=1.4.3",
@@ -13,10 +13,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
+from contextlib import contextmanager
+from typing import Iterator
 
-import psycopg2
+from psycopg2.extensions import cursor
+from psycopg2.pool import ThreadedConnectionPool
 
-latest_db_version = 0
+latest_db_version = 1
+
+# The maximum number of database connections to keep open at once. Timers fire on
+# the scheduler's thread pool, while commands are processed on a separate thread
+max_db_connections = 16
 
 log = logging.getLogger(__name__)
 
@@ -32,62 +39,83 @@ class Storage(object):
         """
         self.db_path = db_path
 
-        # Connect to the database
-        self.conn = psycopg2.connect(db_path)
-        self.cur = self.conn.cursor()
-
-        try:
-            self.cur.execute("SELECT current FROM migrations")
+        # Connect to the database. Each thread borrows its own connection from the
+        # pool, rather than sharing a single cursor
+        self.pool = ThreadedConnectionPool(1, max_db_connections, db_path)
+
+        with self.cursor() as cur:
+            # Create the migrations table if this is a new database, and read the
+            # current schema version in the same round trip
+            cur.execute(
+                """
+                -- Holds information about database migrations
+                CREATE TABLE IF NOT EXISTS migrations (
+                    current INTEGER PRIMARY KEY
+                );
+
+                SELECT current FROM migrations;
+            """
+            )
 
-            row = self.cur.fetchone()
-            if not row:
-                self._initial_setup()
+            row = cur.fetchone()
 
-            # TODO: Migrations
-        except Exception:
-            # migrations table doesn't exist yet, this is a new database
-            self.conn.rollback()
+        if not row:
             self._initial_setup()
+        else:
+            self._run_migrations(row[0])
+
+    @contextmanager
+    def cursor(self) -> Iterator[cursor]:
+        """Borrow a connection from the pool and yield a cursor on it. The
+        transaction is committed if the block completes, and rolled back if it raises
+        """
+        conn = self.pool.getconn()
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    yield cur
+        finally:
+            self.pool.putconn(conn)
 
     def _initial_setup(self):
         """Initial setup of the database"""
         log.info("Performing initial database setup...")
 
-        # Migrations table #
-
-        # Holds information about database migrations
-        self.cur.execute(
-            """
-            CREATE TABLE migrations (
-                current INTEGER PRIMARY KEY
+        # Create the remaining tables in a single round trip, committing
+        # them together
+        with self.cursor() as cur:
+            cur.execute(
+                """
+                -- A new database starts out on the latest schema
+                INSERT INTO migrations
+                (current)
+                VALUES (%s);
+
+                -- FCP timers
+                CREATE TABLE IF NOT EXISTS fcp_timers (
+                    proposal_num INTEGER PRIMARY KEY,
+                    end_timestamp INTEGER NOT NULL
+                );
+            """,
+                (latest_db_version,),
             )
-        """
-        )
 
-        # Initial migration version
-        self.cur.execute(
-            """
-            INSERT INTO migrations
-            (current)
-            VALUES (0)
-        """
-        )
+        log.info("Database setup complete")
 
-        # FCP timers table #
+    def _run_migrations(self, current_version: int):
+        """Migrate the database from the given version to latest_db_version"""
+        if current_version < 1:
+            log.info("Migrating database to version 1...")
 
-        self.cur.execute(
-            """
-            CREATE TABLE fcp_timers (
-                proposal_num INTEGER PRIMARY KEY,
-                end_timestamp INTEGER NOT NULL
-            )
-        """
-        )
+            # The primary key of fcp_timers already provides a unique index on
+            # proposal_num, so this one only slowed down writes
+            with self.cursor() as cur:
+                cur.execute(
+                    """
+                    DROP INDEX IF EXISTS fcp_timers_proposal_num;
 
-        self.cur.execute(
-            """
-            CREATE UNIQUE INDEX fcp_timers_proposal_num ON fcp_timers (proposal_num)
-        """
-        )
+                    UPDATE migrations SET current = 1;
+                """
+                )
 
-        log.info("Database setup complete")
+        log.info("Database is up to date")
@@ -11,14 +11,19 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import json
 import logging
-from typing import Dict
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
 
 from flask import Flask, request
 from github import Github
 from github.Repository import Repository
 from github_webhook import Webhook
+from waitress import serve
 
 from command_handler import CommandHandler
 from config import Config
@@ -26,6 +31,9 @@ from storage import Storage
 
 log = logging.getLogger(__name__)
 
+# How many recent webhook delivery IDs to remember, in order to ignore redeliveries
+MAX_REMEMBERED_DELIVERIES = 1000
+
 
 class WebhookHandler(object):
     def __init__(
@@ -40,6 +48,22 @@ class WebhookHandler(object):
         self.repo = repo
         self.command_handler = CommandHandler(config, store, repo)
 
+        # Config values checked against every comment
+        self._bot_login = config.github_user.login
+        self._proposal_label = config.github_proposal_label
+
+        # Comments are processed in the background, so github receives a response to
+        # its webhook without waiting on our own requests to the github API. A single
+        # worker processes comments in the order they were received
+        self._comment_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="comment-processor"
+        )
+
+        # The IDs of recently received webhook deliveries, oldest first. Github may
+        # redeliver a webhook, which we don't want to process twice
+        self._recent_delivery_ids = OrderedDict()  # type: OrderedDict[str, None]
+        self._recent_delivery_ids_lock = threading.Lock()
+
         # Start a flask webserver
         self.app = Flask(__name__)
 
@@ -61,26 +85,76 @@ class WebhookHandler(object):
 
         @webhook.hook("issue_comment")
         def on_issue_comment(data):
-            log.debug(f"Got comment: {json.dumps(data, indent=4, sort_keys=True)}")
-            self._process_comment(data)
+            self._log_payload("Got comment", data)
+            self._queue_comment(data)
 
         @webhook.hook("pull_request_review")
         def on_pull_request_review(data):
-            log.debug(f"Got PR review: {json.dumps(data, indent=4, sort_keys=True)}")
-            self._process_comment(data)
+            self._log_payload("Got PR review", data)
+            self._queue_comment(data)
 
         @webhook.hook("pull_request_review_comment")
         def on_pull_request_review_comment(data):
-            log.debug(
-                f"Got PR review comment: {json.dumps(data, indent=4, sort_keys=True)}"
-            )
-            self._process_comment(data)
+            self._log_payload("Got PR review comment", data)
+            self._queue_comment(data)
 
     def run(self):
-        from waitress import serve
-
         serve(self.app, host=self.config.webhook_host, port=self.config.webhook_port)
 
+    def _log_payload(self, description: str, data: Dict):
+        """Log a webhook payload at debug level, only serialising it if it will be
+        logged
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("%s: %s", description, json.dumps(data, sort_keys=True))
+
+    def _queue_comment(self, comment: Dict):
+        """Queue a comment to be processed in the background"""
+        delivery_id = request.headers.get("X-GitHub-Delivery")
+        if self._is_redelivery(delivery_id):
+            log.debug("Ignoring redelivered webhook %s", delivery_id)
+            return
+
+        future = self._comment_executor.submit(self._process_comment, comment)
+        future.add_done_callback(
+            functools.partial(self._on_comment_processed, delivery_id)
+        )
+
+    def _is_redelivery(self, delivery_id: Optional[str]) -> bool:
+        """Check whether a webhook delivery has already been received, remembering it
+        if not
+        """
+        if not delivery_id:
+            return False
+
+        with self._recent_delivery_ids_lock:
+            if delivery_id in self._recent_delivery_ids:
+                return True
+
+            self._recent_delivery_ids[delivery_id] = None
+            if len(self._recent_delivery_ids) > MAX_REMEMBERED_DELIVERIES:
+                # Forget the oldest delivery
+                self._recent_delivery_ids.popitem(last=False)
+
+        return False
+
+    def _on_comment_processed(self, delivery_id: Optional[str], future: Future):
+        """Log any exception raised while processing a queued comment.
+
+        A failed delivery is forgotten again, so that redelivering it from github
+        retries it rather than being ignored as a duplicate.
+        """
+        exception = future.exception()
+        if exception:
+            log.error(
+                "Failed to process comment",
+                exc_info=(type(exception), exception, exception.__traceback__),
+            )
+
+            if delivery_id:
+                with self._recent_delivery_ids_lock:
+                    self._recent_delivery_ids.pop(delivery_id, None)
+
     def _process_comment(self, comment: Dict):
         log.debug("Processing comment: %s", comment)
 
@@ -88,7 +162,7 @@ class WebhookHandler(object):
         comment_author_login = comment_author["login"]
 
         # Ignore comments/edits from ourselves
-        if comment_author_login == self.config.github_user.login:
+        if comment_author_login == self._bot_login:
             log.debug("Ignoring comment from ourselves")
             return
 
@@ -96,7 +170,8 @@ class WebhookHandler(object):
         issue = comment["issue"] if "issue" in comment else comment["pull_request"]
 
         # Check if this is a proposal
-        if not self._issue_has_label(issue, self.config.github_proposal_label):
+        label_names = frozenset(label["name"] for label in issue["labels"])
+        if self._proposal_label not in label_names:
             log.debug("Ignoring comment without appropriate proposal label")
             return
 
@@ -108,19 +183,6 @@ class WebhookHandler(object):
         # Process any commands this comment contains
         self.command_handler.handle_comment(comment)
 
-    def _issue_has_label(self, issue: Dict, label_name: str) -> bool:
-        """Check whether a given issue has a label"""
-        for label in issue["labels"]:
-            if label["name"] == label_name:
-                return True
-
-        return False
-
     def _comment_belongs_to_team_member(self, comment: Dict) -> bool:
         """Return whether a comment was posted by a known team member"""
-        author = comment["sender"]
-        for member in self.config.github_team.get_members():
-            if member.login == author["login"]:
-                return True
-
-        return False
+        return self.command_handler.is_team_member(comment["sender"]["login"])